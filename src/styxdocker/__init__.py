@@ -1,15 +1,24 @@
 """.. include:: ../../README.md"""  # noqa: D415
 
+import contextlib
+import functools
+import itertools
 import logging
 import os
 import pathlib as pl
+import secrets
+import selectors
 import shlex
+import shutil
+import struct
+import subprocess
+import threading
+import time
 import typing
-from collections import deque
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
-from functools import partial
-from subprocess import PIPE, Popen
+import weakref
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from subprocess import DEVNULL, PIPE, Popen
 
 from styxdefs import (
     Execution,
@@ -20,22 +29,313 @@ from styxdefs import (
     StyxRuntimeError,
 )
 
+if typing.TYPE_CHECKING:
+    import docker
+
 if os.name == "posix":
     _HOST_UID: int | None = os.getuid()  # type: ignore
 else:
     _HOST_UID = None
 
+# Runner uids are this process's random prefix plus a counter.
+_PROCESS_UID = secrets.token_hex(8)
+_RUNNER_COUNTER = itertools.count()
+
+
+def _reset_process_uid() -> None:
+    """Pick a new prefix so forked processes don't reuse their parent's uids."""
+    global _PROCESS_UID, _RUNNER_COUNTER
+    _PROCESS_UID = secrets.token_hex(8)
+    _RUNNER_COUNTER = itertools.count()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_process_uid)
+
+
+# Quotes are escaped first and backslashes second, so the backslash added in
+# front of a quote is doubled as well.
+_MOUNT_ESCAPE = str.maketrans({'"': '\\\\"', "\\": "\\\\"})
+
 
 def _docker_mount(host_path: str, container_path: str, readonly: bool) -> str:
     """Construct Docker mount argument."""
-    host_path = host_path.replace('"', r"\"")
-    container_path = container_path.replace('"', r"\"")
-    host_path = host_path.replace("\\", "\\\\")
-    container_path = container_path.replace("\\", "\\\\")
+    host_path = host_path.translate(_MOUNT_ESCAPE)
+    container_path = container_path.translate(_MOUNT_ESCAPE)
     readonly_str = ",readonly" if readonly else ""
     return f"type=bind,source={host_path},target={container_path}{readonly_str}"
 
 
+def _docker_env_args(environ: dict[str, str]) -> list[str]:
+    """Construct Docker environment arguments."""
+    return list(
+        itertools.chain.from_iterable(
+            ("--env", f"{key}={value}") for key, value in environ.items()
+        )
+    )
+
+
+def _env_file_safe(key: str, value: str) -> bool:
+    """Whether the docker CLI reads `key=value` back unchanged from an env file.
+
+    The env file parser splits on newlines, drops a trailing carriage return,
+    skips lines starting with `#`, trims leading whitespace and rejects names
+    containing whitespace.
+    """
+    return not (
+        key.startswith("#")
+        or any(c.isspace() for c in key)
+        or "\n" in value
+        or "\r" in value
+    )
+
+
+def _posix_abspath(path: InputPathType) -> str:
+    """Absolute host path with forward slashes, as Docker expects."""
+    return os.path.abspath(path).replace(os.sep, "/")
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hard link a file, falling back to a copy across filesystems."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _copy_if_distinct(src: str, dst: str) -> None:
+    """Copy a file unless both paths refer to the same (hard linked) file."""
+    if not (os.path.exists(dst) and os.path.samefile(src, dst)):
+        shutil.copy2(src, dst)
+
+
+def _remove_containers(
+    containers: dict[str, str],
+    docker_executable: str,
+    docker_client: "docker.DockerClient | None",
+) -> None:
+    """Force remove long-lived containers."""
+    for container_id in containers.values():
+        if docker_client is not None:
+            docker_client.api.remove_container(container_id, force=True)
+        else:
+            subprocess.run(
+                [docker_executable, "rm", "-f", container_id], capture_output=True
+            )
+    containers.clear()
+
+
+def _remove_files(paths: list[str]) -> None:
+    """Remove files, ignoring ones that are already gone."""
+    for path in paths:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+    paths.clear()
+
+
+def _kill_processes(processes: "set[Popen[str]]") -> None:
+    """Kill processes that are still running."""
+    for process in list(processes):
+        process.kill()
+
+
+def _submit_daemon(function: typing.Callable[[], None]) -> "Future[None]":
+    """Run a function in a daemon thread, which doesn't block interpreter exit."""
+    future: Future[None] = Future()
+
+    def target() -> None:
+        try:
+            function()
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(None)
+
+    threading.Thread(target=target, name="styx-docker-pull", daemon=True).start()
+    return future
+
+
+class _LineBuffer:
+    """Split a stream of byte chunks into lines and forward them to a handler.
+
+    Lines longer than `max_line_bytes` are truncated so a process writing
+    without newlines can't grow the buffer without bound.
+    """
+
+    def __init__(
+        self,
+        handler: typing.Callable[[str], None],
+        max_line_bytes: int = 1 << 20,
+    ) -> None:
+        """Create LineBuffer."""
+        self.handler = handler
+        self.max_line_bytes = max_line_bytes
+        self.buffer = bytearray()
+        # Set while discarding the remainder of a truncated line.
+        self.truncated = False
+
+    def _dispatch(self, line: bytes | bytearray) -> None:
+        if len(line) > self.max_line_bytes:
+            line = line[: self.max_line_bytes]
+            self.handler(f"{line.decode('utf-8', errors='replace')} [truncated]")
+        else:
+            self.handler(line.decode("utf-8", errors="replace"))
+
+    def feed(self, chunk: bytes) -> None:
+        """Buffer a chunk and dispatch all complete lines."""
+        if b"\n" in chunk:
+            *lines, tail = (self.buffer + chunk).split(b"\n")
+            if self.truncated:
+                lines = lines[1:]
+                self.truncated = False
+            for line in lines:
+                self._dispatch(line)
+            self.buffer = tail
+        else:
+            self.buffer += chunk
+        if len(self.buffer) > self.max_line_bytes and not self.truncated:
+            self._dispatch(self.buffer)
+            self.buffer = bytearray()
+            self.truncated = True
+        elif self.truncated:
+            self.buffer = bytearray()
+
+    def flush(self) -> None:
+        """Dispatch a trailing line without newline, if any."""
+        if self.buffer and not self.truncated:
+            self._dispatch(self.buffer)
+        self.buffer = bytearray()
+        self.truncated = False
+
+
+class _FrameDemux:
+    """Split a multiplexed Docker stream into stdout and stderr lines.
+
+    Each frame is an 8-byte header, holding the stream type in byte 0 and the
+    big-endian payload length in bytes 4-7, followed by the payload.
+    """
+
+    def __init__(
+        self,
+        stdout_handler: typing.Callable[[str], None],
+        stderr_handler: typing.Callable[[str], None],
+    ) -> None:
+        """Create FrameDemux."""
+        self.buffers = {1: _LineBuffer(stdout_handler), 2: _LineBuffer(stderr_handler)}
+        self.pending = bytearray()
+
+    def feed(self, chunk: bytes) -> None:
+        """Buffer a chunk and dispatch the payloads of all complete frames."""
+        pending = self.pending
+        pending += chunk
+        start = 0
+        while len(pending) - start >= 8:
+            stream_type, length = struct.unpack_from(">BxxxL", pending, start)
+            end = start + 8 + length
+            if end > len(pending):
+                break
+            buffer = self.buffers.get(stream_type)
+            if buffer is not None:
+                buffer.feed(bytes(pending[start + 8 : end]))
+            start = end
+        del pending[:start]
+
+    def flush(self) -> None:
+        """Dispatch trailing lines without newline, if any."""
+        for buffer in self.buffers.values():
+            buffer.flush()
+
+
+def _pump_socket(
+    sock: typing.Any,  # noqa: ANN401
+    stdout_handler: typing.Callable[[str], None],
+    stderr_handler: typing.Callable[[str], None],
+) -> None:
+    """Forward a multiplexed Docker Engine API socket to handlers until EOF."""
+    from docker.utils.socket import read
+
+    demux = _FrameDemux(stdout_handler, stderr_handler)
+    while True:
+        chunk = read(sock, 65536)
+        if chunk is None:
+            # Interrupted read.
+            continue
+        if not chunk:
+            break
+        demux.feed(chunk)
+    demux.flush()
+
+
+def _pump_stream(stream: typing.IO[bytes], buffer: _LineBuffer) -> None:
+    """Forward a stream to a line buffer until EOF."""
+    while chunk := stream.read1(65536):  # type: ignore
+        buffer.feed(chunk)
+    buffer.flush()
+
+
+def _pump_output(
+    stdout: typing.IO[bytes],
+    stderr: typing.IO[bytes],
+    stdout_handler: typing.Callable[[str], None],
+    stderr_handler: typing.Callable[[str], None],
+    io_pool: ThreadPoolExecutor,
+) -> None:
+    """Forward process output line by line until both streams close."""
+    stdout_buffer = _LineBuffer(stdout_handler)
+    stderr_buffer = _LineBuffer(stderr_handler)
+
+    if os.name != "posix":
+        # select() only supports sockets on Windows.
+        wait(
+            [
+                io_pool.submit(_pump_stream, stdout, stdout_buffer),
+                io_pool.submit(_pump_stream, stderr, stderr_buffer),
+            ]
+        )
+        return
+
+    with selectors.DefaultSelector() as selector:
+        selector.register(stdout, selectors.EVENT_READ, stdout_buffer)
+        selector.register(stderr, selectors.EVENT_READ, stderr_buffer)
+        while selector.get_map():
+            for key, _ in selector.select():
+                # Bypass the buffered file object so select() stays accurate.
+                chunk = os.read(key.fd, 65536)
+                if chunk:
+                    key.data.feed(chunk)
+                else:
+                    selector.unregister(key.fileobj)
+                    key.data.flush()
+
+
+class _BatchRouter:
+    """Route the output of a batched container to each execution's handler.
+
+    The batch script echoes `<marker><index>` to both streams before running
+    each execution, which switches the active handler. Output the previous
+    execution left without a trailing newline ends up in front of the marker
+    and still goes to the previous handler.
+    """
+
+    def __init__(
+        self, marker: str, handlers: list[typing.Callable[[str], None]]
+    ) -> None:
+        """Create BatchRouter."""
+        self.marker = marker
+        self.handlers = handlers
+        self.index = 0
+
+    def __call__(self, line: str) -> None:
+        """Dispatch a line."""
+        prefix, marker, index = line.rpartition(self.marker)
+        if marker and index.isdigit():
+            if prefix:
+                self.handlers[self.index](prefix)
+            self.index = int(index)
+        else:
+            self.handlers[self.index](line)
+
+
 class StyxDockerError(StyxRuntimeError):
     """Styx Docker runtime error."""
 
@@ -55,6 +355,26 @@ class StyxDockerError(StyxRuntimeError):
         )
 
 
+class _BatchedRun(typing.NamedTuple):
+    """Execution deferred until the end of a `DockerRunner.batch()` block."""
+
+    execution: "_DockerExecution"
+    cargs: list[str]
+    mounts: list[tuple[str, str, bool]]
+    stdout_handler: typing.Callable[[str], None]
+    stderr_handler: typing.Callable[[str], None]
+
+
+class _Batch:
+    """Executions deferred by a `DockerRunner.batch()` block."""
+
+    def __init__(self) -> None:
+        """Create Batch."""
+        self.runs: list[_BatchedRun] = []
+        # Set once the block has exited and the batch ran (or was abandoned).
+        self.closed = False
+
+
 class _DockerExecution(Execution):
     """Docker execution."""
 
@@ -68,18 +388,51 @@ class _DockerExecution(Execution):
         docker_extra_args: list[str],
         docker_user_id: int | None,
         environ: dict[str, str],
+        environ_args: list[str],
+        io_pool: ThreadPoolExecutor,
+        docker_client: "docker.DockerClient | None" = None,
+        batch: _Batch | None = None,
+        reuse_container: typing.Callable[[str], str] | None = None,
+        image_pull: "Future[None] | None" = None,
+        run_script: bool = False,
     ) -> None:
         """Create DockerExecution."""
         self.logger: logging.Logger = logger
-        self.input_mounts: list[tuple[pl.Path, str, bool]] = []
+        # (absolute host path, container path, mutable)
+        self.input_mounts: list[tuple[str, str, bool]] = []
         self.input_file_next_id = 0
+        # Input ids of host directories, see `_input_bind_mounts()`.
+        self.input_dir_ids: dict[str, int] = {}
+        # File names of `resolve_parent` inputs by container directory. Only
+        # the files they prefix are staged for long-lived containers.
+        self.input_prefixes: dict[str, str] = {}
         self.output_dir = output_dir
+        self.output_dir_abs = _posix_abspath(output_dir)
         self.metadata = metadata
         self.container_tag = container_tag
         self.docker_executable = docker_executable
         self.docker_extra_args = docker_extra_args
         self.docker_user_id = docker_user_id
         self.environ = environ
+        self.environ_args = environ_args
+        self.io_pool = io_pool
+        self.docker_client = docker_client
+        self.batch = batch
+        self.reuse_container = reuse_container
+        self.image_pull = image_pull
+        self.run_script = run_script
+        # Executions that share a container each get their own input and output
+        # directories. Long-lived containers only see the data directory, so
+        # inputs are staged inside the output directory.
+        if reuse_container is not None:
+            self.container_output_dir = f"/styx_data/{output_dir.name}"
+            self.container_input_dir = f"{self.container_output_dir}/.styx_input"
+        elif batch is None:
+            self.container_input_dir = "/styx_input"
+            self.container_output_dir = "/styx_output"
+        else:
+            self.container_input_dir = f"/styx_input/{output_dir.name}"
+            self.container_output_dir = f"/styx_output/{output_dir.name}"
 
     def input_file(
         self,
@@ -102,23 +455,48 @@ class _DockerExecution(Execution):
                 )
 
             local_file = (
-                f"/styx_input/{self.input_file_next_id}/{_host_file_parent.name}"
+                f"{self.container_input_dir}/{self.input_file_next_id}/"
+                f"{_host_file_parent.name}"
             )
             resolved_file = f"{local_file}/{_host_file.name}"
-            self.input_mounts.append((_host_file_parent, local_file, mutable))
+            self.input_mounts.append(
+                (_posix_abspath(_host_file_parent), local_file, mutable)
+            )
+            self.input_prefixes[local_file] = _host_file.name
+            self.input_file_next_id += 1
         else:
             if not _host_file.exists():
                 # See note above.
                 # We don't know if the 'file' here is a directory or file
                 # so we can't additionally assert that it is.
                 raise FileNotFoundError(f'Input file not found: "{_host_file}"')
+            if self.reuse_container is not None and _host_file.is_dir():
+                # Staging would copy the whole tree for every execution.
+                raise ValueError(
+                    "Directory inputs are not supported with reuse_containers: "
+                    f'"{_host_file}"'
+                )
+
+            host_path = _posix_abspath(_host_file)
+            # Read-only files from the same directory share an input id so they
+            # can be mounted together. Mutable files are mounted on their own so
+            # their siblings stay read-only, symlinks as their targets may not
+            # be visible from inside the container.
+            if mutable or _host_file.is_symlink():
+                input_id = self.input_file_next_id
+                self.input_file_next_id += 1
+            else:
+                input_id = self.input_dir_ids.setdefault(
+                    os.path.dirname(host_path), self.input_file_next_id
+                )
+                if input_id == self.input_file_next_id:
+                    self.input_file_next_id += 1
 
             resolved_file = local_file = (
-                f"/styx_input/{self.input_file_next_id}/{_host_file.name}"
+                f"{self.container_input_dir}/{input_id}/{_host_file.name}"
             )
-            self.input_mounts.append((_host_file, local_file, mutable))
+            self.input_mounts.append((host_path, local_file, mutable))
 
-        self.input_file_next_id += 1
         return resolved_file
 
     def output_file(self, local_file: str, optional: bool = False) -> OutputPathType:
@@ -136,83 +514,368 @@ class _DockerExecution(Execution):
         handle_stderr: typing.Callable[[str], None] | None = None,
     ) -> None:
         """Execute."""
-        mounts: list[str] = []
+        if not cargs:
+            raise ValueError("No command to run")
+
+        # Output directory
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        # (host path, container path, readonly)
+        mounts: list[tuple[str, str, bool]] = []
+        if self.reuse_container is not None:
+            self._stage_inputs()
+        else:
+            mounts.extend(self._input_bind_mounts())
+            mounts.append((self.output_dir_abs, self.container_output_dir, False))
 
-        for host_file, local_file, mutable in self.input_mounts:
-            mounts.append("--mount")
-            mounts.append(
-                _docker_mount(
-                    host_file.absolute().as_posix(), local_file, readonly=not mutable
+        if self.run_script:
+            self._write_run_script(cargs)
+            # Run through bash, the data directory may be mounted noexec and
+            # bind mounts from Windows hosts don't carry the executable bit.
+            command = ["/bin/bash", "./run.sh"]
+        else:
+            # Docker takes an argv, so there is nothing for a shell to do.
+            command = cargs
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Running command: %s", shlex.join(cargs))
+
+        _stdout_handler = (
+            handle_stdout if handle_stdout else lambda line: self.logger.info(line)
+        )
+        _stderr_handler = (
+            handle_stderr if handle_stderr else lambda line: self.logger.error(line)
+        )
+
+        if self.batch is not None:
+            if self.batch.closed:
+                raise RuntimeError(
+                    "Execution was started in a batch() block that has exited"
                 )
+            self.batch.runs.append(
+                _BatchedRun(self, cargs, mounts, _stdout_handler, _stderr_handler)
             )
+            return
 
-        # Output directory
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+        time_start = time.perf_counter_ns()
+        try:
+            return_code, docker_command = self._launch(
+                f"styx_{self.output_dir.name}",
+                mounts,
+                self.container_output_dir,
+                command,
+                cargs,
+                _stdout_handler,
+                _stderr_handler,
+            )
+        finally:
+            self._unstage_inputs()
+        time_end = time.perf_counter_ns()
+        self.logger.info(
+            "Executed %s %s in %.3fs",
+            self.metadata.package,
+            self.metadata.name,
+            (time_end - time_start) / 1e9,
+        )
+        if return_code:
+            raise StyxDockerError(return_code, cargs, docker_command)
 
-        # Create run script
-        run_script = self.output_dir / "run.sh"
-        # Ensure utf-8 encoding and unix newlines
-        run_script.write_text(
-            f"#!/bin/bash\n{shlex.join(cargs)}\n", encoding="utf-8", newline="\n"
+    def _write_run_script(self, cargs: list[str]) -> None:
+        """Write the command to `run.sh` in the output directory."""
+        # Ensure utf-8 encoding and unix newlines (O_BINARY: no translation on
+        # Windows). Executable so it can be run by hand.
+        fd = os.open(
+            self.output_dir / "run.sh",
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0),
+            0o755,
         )
+        try:
+            os.write(fd, f"#!/bin/bash\n{shlex.join(cargs)}\n".encode())
+        finally:
+            os.close(fd)
+
+    def _input_bind_mounts(self) -> list[tuple[str, str, bool]]:
+        """Input bind mounts as (host path, container path, readonly).
+
+        Read-only inputs sharing a container directory come from the same host
+        directory and are mounted as that directory, which keeps the number of
+        mounts down for tools with many inputs. Mutable inputs are always
+        mounted on their own.
+        """
+        groups: defaultdict[str, list[tuple[str, str, bool]]] = defaultdict(list)
+        for input_mount in dict.fromkeys(self.input_mounts):
+            groups[input_mount[1].rpartition("/")[0]].append(input_mount)
 
-        mounts.append("--mount")
-        mounts.append(
-            _docker_mount(
-                self.output_dir.absolute().as_posix(), "/styx_output", readonly=False
+        mounts: list[tuple[str, str, bool]] = []
+        for local_dir, group in groups.items():
+            host_file, local_file, mutable = group[0]
+            if len(group) > 1 and not mutable:
+                mounts.append((os.path.dirname(host_file), local_dir, not mutable))
+            else:
+                mounts.append((host_file, local_file, not mutable))
+        return mounts
+
+    def _staged_path(self, local_file: str) -> pl.Path:
+        """Host path of a staged input file."""
+        return self.output_dir / local_file[len(self.container_output_dir) + 1 :]
+
+    def _stage_inputs(self) -> None:
+        """Copy inputs into the output directory.
+
+        Read-only inputs are copied so the execution can't modify the originals.
+        Mutable inputs are hard linked where possible, changes to copies are
+        written back by `_unstage_inputs()`.
+        """
+        for host_file, local_file, mutable in dict.fromkeys(self.input_mounts):
+            stage = _link_or_copy if mutable else shutil.copy2
+            staged_file = self._staged_path(local_file)
+            prefix = self.input_prefixes.get(local_file)
+            if prefix is None:
+                staged_file.parent.mkdir(parents=True, exist_ok=True)
+                stage(host_file, str(staged_file))
+                continue
+            staged_file.mkdir(parents=True, exist_ok=True)
+            with os.scandir(host_file) as entries:
+                for entry in entries:
+                    if entry.name.startswith(prefix) and entry.is_file():
+                        stage(entry.path, str(staged_file / entry.name))
+
+    def _unstage_inputs(self) -> None:
+        """Write back changes to staged mutable inputs and remove the staged files.
+
+        For `resolve_parent` inputs, files the execution created next to the
+        staged files are written back as well.
+        """
+        if self.reuse_container is None:
+            return
+        try:
+            for host_file, local_file, mutable in dict.fromkeys(self.input_mounts):
+                if not mutable:
+                    continue
+                staged_file = self._staged_path(local_file)
+                if staged_file.is_dir():
+                    shutil.copytree(
+                        staged_file,
+                        host_file,
+                        copy_function=_copy_if_distinct,
+                        dirs_exist_ok=True,
+                    )
+                else:
+                    _copy_if_distinct(str(staged_file), host_file)
+        finally:
+            shutil.rmtree(
+                self._staged_path(self.container_input_dir), ignore_errors=True
             )
+
+    def _launch(
+        self,
+        name: str,
+        mounts: list[tuple[str, str, bool]],
+        working_dir: str,
+        command: list[str],
+        cargs: list[str] | None,
+        stdout_handler: typing.Callable[[str], None],
+        stderr_handler: typing.Callable[[str], None],
+    ) -> tuple[int | None, list[str] | None]:
+        """Run a command in a new or long-lived container.
+
+        The first element of `command` replaces the image entrypoint.
+
+        Returns:
+            The return code and, for the CLI backend, the Docker command.
+        """
+        if self.image_pull is not None:
+            self.image_pull.result()
+        container_id = (
+            self.reuse_container(self.container_tag)
+            if self.reuse_container is not None
+            else None
         )
+        if self.docker_client is not None:
+            if container_id is not None:
+                return_code = self._exec_api(
+                    self.docker_client,
+                    container_id,
+                    working_dir,
+                    command,
+                    cargs,
+                    stdout_handler,
+                    stderr_handler,
+                )
+            else:
+                return_code = self._run_api(
+                    self.docker_client,
+                    name,
+                    mounts,
+                    working_dir,
+                    command,
+                    cargs,
+                    stdout_handler,
+                    stderr_handler,
+                )
+            return return_code, None
+        if container_id is not None:
+            # The environment may have changed since the container started.
+            docker_command = [
+                self.docker_executable,
+                "exec",
+                *self.environ_args,
+                "-w",
+                working_dir,
+                container_id,
+                *command,
+            ]
+        else:
+            docker_command = self._docker_command(name, mounts, working_dir, command)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Running docker: %s", shlex.join(docker_command))
+        return_code = self._run_cli(docker_command, stdout_handler, stderr_handler)
+        return return_code, docker_command
 
-        environ_arg_args: list[str] = []
-        for key, value in self.environ.items():
-            environ_arg_args.extend(["--env", f"{key}={value}"])
+    def _docker_command(
+        self,
+        name: str,
+        mounts: list[tuple[str, str, bool]],
+        working_dir: str,
+        command: list[str],
+    ) -> list[str]:
+        """Build the Docker CLI command line."""
+        mount_args = list(
+            itertools.chain.from_iterable(
+                ("--mount", _docker_mount(host_path, container_path, readonly))
+                for host_path, container_path, readonly in mounts
+            )
+        )
 
-        docker_command: list[str] = [
+        return [
             self.docker_executable,
             "run",
             *self.docker_extra_args,
             "--rm",
             "--name",
-            f"styx_{self.output_dir.name}",
+            name,
             *(
                 ["-u", str(self.docker_user_id)]
                 if self.docker_user_id is not None
                 else []
             ),
             "-w",
-            "/styx_output",
-            *mounts,
+            working_dir,
+            *mount_args,
             "--entrypoint",
-            "/bin/bash",
-            *environ_arg_args,
+            command[0],
+            *self.environ_args,
             self.container_tag,
-            "./run.sh",
+            *command[1:],
         ]
 
-        self.logger.debug(f"Running docker: {shlex.join(docker_command)}")
-        self.logger.debug(f"Running command: {shlex.join(cargs)}")
+    def _run_cli(
+        self,
+        docker_command: list[str],
+        stdout_handler: typing.Callable[[str], None],
+        stderr_handler: typing.Callable[[str], None],
+    ) -> int | None:
+        """Run the container through the Docker CLI."""
+        with Popen(docker_command, stdout=PIPE, stderr=PIPE) as process:
+            _pump_output(
+                process.stdout,  # type: ignore
+                process.stderr,  # type: ignore
+                stdout_handler,
+                stderr_handler,
+                self.io_pool,
+            )
+        return process.poll()
 
-        _stdout_handler = (
-            handle_stdout if handle_stdout else lambda line: self.logger.info(line)
-        )
-        _stderr_handler = (
-            handle_stderr if handle_stderr else lambda line: self.logger.error(line)
-        )
+    def _run_api(
+        self,
+        client: "docker.DockerClient",
+        name: str,
+        mounts: list[tuple[str, str, bool]],
+        working_dir: str,
+        command: list[str],
+        cargs: list[str] | None,
+        stdout_handler: typing.Callable[[str], None],
+        stderr_handler: typing.Callable[[str], None],
+    ) -> int | None:
+        """Run the container through the Docker Engine API."""
+        import docker
 
-        time_start = datetime.now()
-        with Popen(docker_command, text=True, stdout=PIPE, stderr=PIPE) as process:
-            with ThreadPoolExecutor(2) as pool:  # two threads to handle the streams
-                exhaust = partial(pool.submit, partial(deque, maxlen=0))
-                exhaust(_stdout_handler(line[:-1]) for line in process.stdout)  # type: ignore
-                exhaust(_stderr_handler(line[:-1]) for line in process.stderr)  # type: ignore
-        return_code = process.poll()
-        time_end = datetime.now()
-        self.logger.info(
-            f"Executed {self.metadata.package} {self.metadata.name} "
-            f"in {time_end - time_start}"
+        create = functools.partial(
+            client.containers.create,
+            self.container_tag,
+            command=command[1:],
+            name=name,
+            user=str(self.docker_user_id) if self.docker_user_id is not None else None,
+            working_dir=working_dir,
+            mounts=[
+                docker.types.Mount(
+                    target=container_path,
+                    source=host_path,
+                    type="bind",
+                    read_only=readonly,
+                )
+                for host_path, container_path, readonly in mounts
+            ],
+            # A string entrypoint would be split on whitespace.
+            entrypoint=command[:1],
+            environment=self.environ,
         )
-        if return_code:
-            raise StyxDockerError(return_code, cargs, docker_command)
+        try:
+            try:
+                container = create()
+            except docker.errors.ImageNotFound:
+                # Unlike `containers.run()`, `create()` doesn't pull missing images.
+                client.images.pull(self.container_tag)
+                container = create()
+        except docker.errors.DockerException as e:
+            raise StyxDockerError(None, cargs) from e
+
+        try:
+            try:
+                # Attach before starting so no output is missed.
+                sock = client.api.attach_socket(
+                    container.id,
+                    params={"stdout": 1, "stderr": 1, "stream": 1, "logs": 1},
+                )
+            except docker.errors.DockerException as e:
+                raise StyxDockerError(None, cargs) from e
+            try:
+                try:
+                    container.start()
+                except docker.errors.DockerException as e:
+                    raise StyxDockerError(None, cargs) from e
+                _pump_socket(sock, stdout_handler, stderr_handler)
+            finally:
+                sock.close()
+            return container.wait()["StatusCode"]
+        finally:
+            container.remove(force=True)
+
+    def _exec_api(
+        self,
+        client: "docker.DockerClient",
+        container_id: str,
+        working_dir: str,
+        command: list[str],
+        cargs: list[str] | None,
+        stdout_handler: typing.Callable[[str], None],
+        stderr_handler: typing.Callable[[str], None],
+    ) -> int | None:
+        """Run a command in a long-lived container through the Docker Engine API."""
+        import docker
+
+        try:
+            exec_id = client.api.exec_create(
+                container_id, command, workdir=working_dir, environment=self.environ
+            )["Id"]
+            sock = client.api.exec_start(exec_id, socket=True)
+        except docker.errors.DockerException as e:
+            raise StyxDockerError(None, cargs) from e
+        try:
+            _pump_socket(sock, stdout_handler, stderr_handler)
+        finally:
+            sock.close()
+        return client.api.exec_inspect(exec_id)["ExitCode"]
 
 
 class DockerRunner(Runner):
@@ -228,11 +891,40 @@ class DockerRunner(Runner):
         docker_user_id: int | None = None,
         data_dir: InputPathType | None = None,
         environ: dict[str, str] | None = None,
+        use_docker_api: bool = False,
+        reuse_containers: bool = False,
+        run_script: bool = False,
+        prefetch_images: bool = True,
     ) -> None:
-        """Create a new DockerRunner."""
+        """Create a new DockerRunner.
+
+        Args:
+            image_overrides: Map of container image tags to replacement tags.
+            docker_executable: Docker executable (CLI backend only).
+            docker_extra_args: Extra `docker run` arguments (CLI backend only).
+            docker_user_id: User ID to run containers as.
+            data_dir: Directory for execution inputs and outputs.
+            environ: Environment variables to set in the container.
+            use_docker_api: Talk to the Docker daemon through the Engine API
+                (requires the `api` extra) instead of invoking the Docker CLI
+                for every execution.
+            reuse_containers: Keep one container per image running and run
+                executions in it with `docker exec`. Inputs are copied into the
+                data directory instead of bind mounted, directory inputs are
+                not supported. Call `close()` to remove the containers.
+            run_script: Write each command to `run.sh` in its output directory
+                and run it from there, so executions can be reproduced by hand.
+                By default the command is passed to the container directly.
+            prefetch_images: Pull missing images in the background when an
+                execution is started. Otherwise only images passed to
+                `prefetch()` are pulled ahead of the container start.
+        """
         self.data_dir = pl.Path(data_dir or "styx_tmp")
-        self.uid = os.urandom(8).hex()
+        self.uid = f"{_PROCESS_UID}_{next(_RUNNER_COUNTER)}"
         self.execution_counter = 0
+        self.batch_counter = 0
+        # Batches are per thread, see `batch()`.
+        self._batch_state = threading.local()
         self.docker_executable = docker_executable
         self.docker_extra_args = docker_extra_args or []
         self.docker_user_id = (
@@ -240,6 +932,43 @@ class DockerRunner(Runner):
         )
         self.image_overrides = image_overrides or {}
         self.environ = environ or {}
+        # Shared by all executions, only used where select() can't wait on pipes.
+        self._io_pool = ThreadPoolExecutor(
+            max_workers=min(32, (os.cpu_count() or 1) + 4),
+            thread_name_prefix="styx-docker-io",
+        )
+        weakref.finalize(self, self._io_pool.shutdown)
+        # Pulls run in daemon threads, `docker pull` processes are killed by
+        # `close()` or at exit.
+        self.prefetch_images = prefetch_images
+        self._pull_futures: dict[str, Future[None]] = {}
+        self._pull_lock = threading.Lock()
+        self._pull_processes: set[Popen[str]] = set()
+        weakref.finalize(self, _kill_processes, self._pull_processes)
+        self.docker_client: "docker.DockerClient | None" = None
+        if use_docker_api:
+            import docker
+
+            self.docker_client = docker.from_env()
+        self.reuse_containers = reuse_containers
+        self.run_script = run_script
+        self._containers: dict[str, str] = {}
+        self._container_counter = itertools.count()
+        self._containers_lock = threading.Lock()
+        # The finalizers clean up after runners that aren't closed, `close()`
+        # can be called any number of times.
+        weakref.finalize(
+            self,
+            _remove_containers,
+            self._containers,
+            self.docker_executable,
+            self.docker_client,
+        )
+        # Env files written by `_environ_args()`, for the environment they hold.
+        self._env_files: list[str] = []
+        self._env_key: tuple[tuple[str, str], ...] | None = None
+        self._env_args: list[str] = []
+        weakref.finalize(self, _remove_files, self._env_files)
 
         # Configure logger
         self.logger = logging.getLogger(self.logger_name)
@@ -251,6 +980,11 @@ class DockerRunner(Runner):
             ch.setFormatter(formatter)
             self.logger.addHandler(ch)
 
+        if self.docker_client is not None and self.docker_extra_args:
+            self.logger.warning(
+                "docker_extra_args are ignored when using the Docker Engine API"
+            )
+
     def start_execution(self, metadata: Metadata) -> Execution:
         """Start execution."""
         if metadata.container_image_tag is None:
@@ -269,4 +1003,295 @@ class DockerRunner(Runner):
             docker_executable=self.docker_executable,
             docker_extra_args=self.docker_extra_args,
             environ=self.environ,
+            environ_args=self._environ_args() if self.docker_client is None else [],
+            io_pool=self._io_pool,
+            docker_client=self.docker_client,
+            batch=getattr(self._batch_state, "batch", None),
+            reuse_container=self._reusable_container if self.reuse_containers else None,
+            image_pull=self._prefetch(container_tag)
+            if self.prefetch_images
+            else self._pull_futures.get(container_tag),
+            run_script=self.run_script,
         )
+
+    def prefetch(self, container_tag: str) -> "Future[None]":
+        """Pull an image in the background unless it is available locally.
+
+        Unless `prefetch_images` is disabled, images are prefetched when an
+        execution is started. Executions wait for the pull before running.
+        Call this ahead of time to overlap pulls with other work.
+
+        Args:
+            container_tag: Image tag, before `image_overrides` are applied.
+
+        Returns:
+            Future that completes once the image is available or the pull
+            failed. Failures are logged; the container start reports them.
+        """
+        return self._prefetch(self.image_overrides.get(container_tag, container_tag))
+
+    def _prefetch(self, container_tag: str) -> "Future[None]":
+        with self._pull_lock:
+            future = self._pull_futures.get(container_tag)
+            if future is None:
+                future = _submit_daemon(functools.partial(self._pull, container_tag))
+                self._pull_futures[container_tag] = future
+            return future
+
+    def _pull(self, container_tag: str) -> None:
+        """Pull an image if it is not available locally."""
+        if self.docker_client is not None:
+            import docker
+
+            try:
+                self.docker_client.images.get(container_tag)
+                return
+            except docker.errors.ImageNotFound:
+                pass
+            self.logger.info("Pulling %s", container_tag)
+            try:
+                self.docker_client.images.pull(container_tag)
+            except docker.errors.DockerException as e:
+                self.logger.warning("Failed to pull %s: %s", container_tag, e)
+            return
+
+        inspect_command = [self.docker_executable, "image", "inspect", container_tag]
+        if subprocess.run(inspect_command, capture_output=True).returncode == 0:
+            return
+        self.logger.info("Pulling %s", container_tag)
+        with Popen(
+            [self.docker_executable, "pull", container_tag],
+            stdout=DEVNULL,
+            stderr=PIPE,
+            text=True,
+        ) as process:
+            self._pull_processes.add(process)
+            try:
+                _, stderr = process.communicate()
+            finally:
+                self._pull_processes.discard(process)
+        if process.returncode > 0:
+            self.logger.warning("Failed to pull %s: %s", container_tag, stderr.strip())
+
+    def _environ_args(self) -> list[str]:
+        """Docker CLI environment arguments.
+
+        The environment is written to an env file, so the command line does
+        not grow with the number of variables. A new file is written whenever
+        `environ` changed, files are removed by `close()`. Variables an env file
+        can't hold unchanged fall back to `--env`.
+        """
+        env_key = tuple(self.environ.items())
+        if env_key == self._env_key:
+            return self._env_args
+        if not self.environ or not all(
+            _env_file_safe(key, value) for key, value in self.environ.items()
+        ):
+            env_args = _docker_env_args(self.environ)
+        else:
+            env_file = self.data_dir / f"{self.uid}_{len(self._env_files)}.env"
+            env_file.parent.mkdir(parents=True, exist_ok=True)
+            # Only readable by the user, the environment may hold secrets.
+            fd = os.open(
+                env_file,
+                os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0),
+                0o600,
+            )
+            self._env_files.append(str(env_file))
+            try:
+                os.write(
+                    fd,
+                    "".join(
+                        f"{key}={value}\n" for key, value in self.environ.items()
+                    ).encode(),
+                )
+            finally:
+                os.close(fd)
+            env_args = ["--env-file", _posix_abspath(env_file)]
+        self._env_key = env_key
+        self._env_args = env_args
+        return env_args
+
+    def _reusable_container(self, container_tag: str) -> str:
+        """Get or start the long-lived container for an image."""
+        with self._containers_lock:
+            container_id = self._containers.get(container_tag)
+            if container_id is None:
+                container_id = self._start_container(container_tag)
+                self._containers[container_tag] = container_id
+            return container_id
+
+    def _start_container(self, container_tag: str) -> str:
+        """Start a long-lived container and return its id."""
+        name = f"styx_{self.uid}_{next(self._container_counter)}"
+        data_dir = self.data_dir.absolute()
+        data_dir.mkdir(parents=True, exist_ok=True)
+        if self.docker_client is not None:
+            import docker
+
+            return self.docker_client.containers.run(
+                container_tag,
+                command=["infinity"],
+                name=name,
+                user=str(self.docker_user_id)
+                if self.docker_user_id is not None
+                else None,
+                mounts=[
+                    docker.types.Mount(
+                        target="/styx_data",
+                        source=data_dir.as_posix(),
+                        type="bind",
+                    )
+                ],
+                entrypoint="sleep",
+                environment=self.environ,
+                detach=True,
+                auto_remove=True,
+            ).id
+        docker_command = [
+            self.docker_executable,
+            "run",
+            *self.docker_extra_args,
+            "-d",
+            "--rm",
+            "--name",
+            name,
+            *(
+                ["-u", str(self.docker_user_id)]
+                if self.docker_user_id is not None
+                else []
+            ),
+            "--mount",
+            _docker_mount(data_dir.as_posix(), "/styx_data", readonly=False),
+            "--entrypoint",
+            "sleep",
+            *self._environ_args(),
+            container_tag,
+            "infinity",
+        ]
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Starting container: %s", shlex.join(docker_command))
+        process = subprocess.run(docker_command, capture_output=True, text=True)
+        if process.returncode:
+            self.logger.error("Failed to start container: %s", process.stderr.strip())
+            raise StyxDockerError(process.returncode, None, docker_command)
+        return process.stdout.strip()
+
+    def close(self) -> None:
+        """Remove long-lived containers started with `reuse_containers`.
+
+        Also removes the env files holding `environ` and stops image pulls.
+        """
+        with self._containers_lock:
+            _remove_containers(
+                self._containers, self.docker_executable, self.docker_client
+            )
+        _kill_processes(self._pull_processes)
+        _remove_files(self._env_files)
+        self._env_key = None
+
+    def __enter__(self) -> "DockerRunner":
+        """Enter context."""
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Exit context, removing long-lived containers."""
+        self.close()
+
+    @contextlib.contextmanager
+    def batch(self) -> typing.Iterator[None]:
+        """Defer executions and run them together, one container per image.
+
+        Executions started inside the block are collected and run when the
+        block exits. All executions that use the same image share a single
+        container, saving the container startup cost for all but the first.
+        Outputs of deferred executions only exist after the block exits.
+        Only executions started by the thread that entered the block are
+        deferred.
+
+        Example:
+            ```python
+            with runner.batch():
+                for subject in subjects:
+                    results.append(some_tool(subject))
+            # results are available here
+            ```
+        """
+        if getattr(self._batch_state, "batch", None) is not None:
+            # Nested batches join the outer one.
+            yield
+            return
+        batch = _Batch()
+        self._batch_state.batch = batch
+        try:
+            yield
+        finally:
+            self._batch_state.batch = None
+            batch.closed = True
+
+        groups: dict[str, list[_BatchedRun]] = {}
+        for batched_run in batch.runs:
+            groups.setdefault(batched_run.execution.container_tag, []).append(
+                batched_run
+            )
+        for group in groups.values():
+            self._run_batch(group)
+
+    def _run_batch(self, group: list[_BatchedRun]) -> None:
+        """Run batched executions sharing an image in a single container."""
+        name = f"styx_{self.uid}_batch_{self.batch_counter}"
+        self.batch_counter += 1
+        marker = f"{name}:"
+
+        script_lines: list[str] = []
+        mounts: list[tuple[str, str, bool]] = []
+        for index, batched_run in enumerate(group):
+            command = (
+                "/bin/bash ./run.sh"
+                if self.run_script
+                else shlex.join(batched_run.cargs)
+            )
+            script_lines.append(f"echo {marker}{index}; echo {marker}{index} >&2")
+            script_lines.append(
+                f"cd {shlex.quote(batched_run.execution.container_output_dir)}"
+                f" && {command} || exit $?"
+            )
+            mounts.extend(batched_run.mounts)
+
+        # A single argument is limited to 128 KiB on Linux, too small for large
+        # batches. Long-lived containers see the script in the data directory.
+        script_file = self.data_dir / f"{name}.sh"
+        script_file.parent.mkdir(parents=True, exist_ok=True)
+        script_file.write_bytes("\n".join([*script_lines, ""]).encode())
+        container_script = f"/styx_data/{script_file.name}"
+        mounts.append((_posix_abspath(script_file), container_script, True))
+
+        stdout_router = _BatchRouter(marker, [r.stdout_handler for r in group])
+        stderr_router = _BatchRouter(marker, [r.stderr_handler for r in group])
+
+        time_start = time.perf_counter_ns()
+        try:
+            return_code, docker_command = group[0].execution._launch(
+                name,
+                mounts,
+                "/",
+                ["/bin/bash", container_script],
+                None,
+                stdout_router,
+                stderr_router,
+            )
+        finally:
+            script_file.unlink()
+            for batched_run in group:
+                batched_run.execution._unstage_inputs()
+        time_end = time.perf_counter_ns()
+        self.logger.info(
+            "Executed batch of %d in %s in %.3fs",
+            len(group),
+            group[0].execution.container_tag,
+            (time_end - time_start) / 1e9,
+        )
+        if return_code:
+            raise StyxDockerError(
+                return_code, group[stdout_router.index].cargs, docker_command
+            )
@@ -0,0 +1,703 @@
+"""Tests for styxdocker."""
+
+import json
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import threading
+import time
+import typing
+from unittest import mock
+
+import pytest
+from styxdefs import Metadata
+
+from styxdocker import (
+    DockerRunner,
+    StyxDockerError,
+    _BatchRouter,
+    _docker_env_args,
+    _docker_mount,
+    _DockerExecution,
+    _FrameDemux,
+    _LineBuffer,
+)
+
+
+def test_line_buffer_splits_chunks() -> None:
+    """Lines split across chunks are reassembled."""
+    lines: list[str] = []
+    buffer = _LineBuffer(lines.append)
+    buffer.feed(b"hello\nwor")
+    buffer.feed(b"ld\n")
+    assert lines == ["hello", "world"]
+
+
+def test_line_buffer_flush() -> None:
+    """A trailing line without newline is dispatched on flush."""
+    lines: list[str] = []
+    buffer = _LineBuffer(lines.append)
+    buffer.feed(b"a\nb")
+    buffer.flush()
+    buffer.flush()
+    assert lines == ["a", "b"]
+
+
+def test_batch_router() -> None:
+    """Marker lines switch the handler and are not forwarded."""
+    first: list[str] = []
+    second: list[str] = []
+    router = _BatchRouter("m:", [first.append, second.append])
+    for line in ["m:0", "a", "m:1", "b", "c"]:
+        router(line)
+    assert first == ["a"]
+    assert second == ["b", "c"]
+    assert router.index == 1
+
+
+def test_batch_router_marker_after_partial_line() -> None:
+    """Output without a trailing newline stays with its own execution."""
+    first: list[str] = []
+    second: list[str] = []
+    router = _BatchRouter("m:", [first.append, second.append])
+    for line in ["m:0", "no-newlinem:1", "second"]:
+        router(line)
+    assert first == ["no-newline"]
+    assert second == ["second"]
+    assert router.index == 1
+
+
+def test_line_buffer_truncates_long_lines() -> None:
+    """Overlong lines are truncated and their remainder dropped."""
+    lines: list[str] = []
+    buffer = _LineBuffer(lines.append, max_line_bytes=4)
+    buffer.feed(b"abc")
+    buffer.feed(b"defgh")
+    buffer.feed(b"ij\nok\n123456\n")
+    buffer.feed(b"xyzxyz")
+    buffer.flush()
+    assert lines == ["abcd [truncated]", "ok", "1234 [truncated]", "xyzx [truncated]"]
+
+
+def test_docker_mount_escaping() -> None:
+    """Quotes and backslashes are escaped."""
+    assert _docker_mount('/a"b', "/c\\d", readonly=True) == (
+        'type=bind,source=/a\\\\"b,target=/c\\\\d,readonly'
+    )
+    assert _docker_mount("/a", "/b", readonly=False) == "type=bind,source=/a,target=/b"
+
+
+def test_docker_env_args() -> None:
+    """Environment variables become a flat list of --env arguments."""
+    assert _docker_env_args({"A": "1", "B": "x=y"}) == [
+        "--env",
+        "A=1",
+        "--env",
+        "B=x=y",
+    ]
+
+
+def test_input_mounts_share_directories(tmp_path: pathlib.Path) -> None:
+    """Read-only inputs from the same directory are mounted as that directory."""
+    (tmp_path / "a").mkdir()
+    for name in ["w.txt", "x.txt", "y.txt", "z.txt"]:
+        (tmp_path / "a" / name).touch()
+    (tmp_path / "b.txt").touch()
+
+    runner = DockerRunner(data_dir=tmp_path / "data", prefetch_images=False)
+    execution = runner.start_execution(
+        Metadata(id="id", name="tool", package="pkg", container_image_tag="image")
+    )
+    x = execution.input_file(tmp_path / "a" / "x.txt")
+    b = execution.input_file(tmp_path / "b.txt")
+    y = execution.input_file(tmp_path / "a" / "y.txt")
+    z = execution.input_file(tmp_path / "a" / "z.txt", mutable=True)
+    w = execution.input_file(tmp_path / "a" / "w.txt", mutable=True)
+
+    assert x == "/styx_input/0/x.txt"
+    assert b == "/styx_input/1/b.txt"
+    assert y == "/styx_input/0/y.txt"
+    assert z == "/styx_input/2/z.txt"
+    assert w == "/styx_input/3/w.txt"
+    assert execution._input_bind_mounts() == [  # type: ignore
+        ((tmp_path / "a").as_posix(), "/styx_input/0", True),
+        ((tmp_path / "b.txt").as_posix(), "/styx_input/1/b.txt", True),
+        ((tmp_path / "a" / "z.txt").as_posix(), "/styx_input/2/z.txt", False),
+        ((tmp_path / "a" / "w.txt").as_posix(), "/styx_input/3/w.txt", False),
+    ]
+
+
+def _frame(stream_type: int, payload: bytes) -> bytes:
+    """Multiplexed Docker stream frame."""
+    return bytes([stream_type, 0, 0, 0]) + len(payload).to_bytes(4, "big") + payload
+
+
+def test_frame_demux() -> None:
+    """Frames are routed by stream type, even when split across chunks."""
+    stdout: list[str] = []
+    stderr: list[str] = []
+    demux = _FrameDemux(stdout.append, stderr.append)
+
+    data = _frame(1, b"a\nb") + _frame(2, b"err\n") + _frame(1, b"c\nd")
+    for i in range(0, len(data), 3):
+        demux.feed(data[i : i + 3])
+    demux.flush()
+
+    assert stdout == ["a", "bc", "d"]
+    assert stderr == ["err"]
+
+
+def test_environ_args_follow_environ(tmp_path: pathlib.Path) -> None:
+    """Env files are private, rewritten when `environ` changes and removed."""
+    runner = DockerRunner(data_dir=tmp_path, environ={"A": "1"})
+    args = runner._environ_args()  # type: ignore
+    assert runner._environ_args() is args  # type: ignore
+    runner.environ["B"] = "2"
+    flag, env_file = runner._environ_args()  # type: ignore
+    assert flag == "--env-file"
+    assert pathlib.Path(env_file).read_text() == "A=1\nB=2\n"
+    if os.name == "posix":
+        assert pathlib.Path(env_file).stat().st_mode & 0o777 == 0o600
+    runner.close()
+    assert not list(tmp_path.glob("*.env"))
+
+
+@pytest.mark.parametrize(
+    "environ",
+    [
+        {"A": "1\n2"},
+        {"A": "1\r"},
+        {"A\r": "1"},
+        {"#A": "1"},
+        {" A": "1"},
+        {"A B": "1"},
+    ],
+)
+def test_environ_args_fallback(tmp_path: pathlib.Path, environ: dict[str, str]) -> None:
+    """Variables an env file would mangle are passed with `--env`."""
+    runner = DockerRunner(data_dir=tmp_path, environ={"B": "2", **environ})
+    assert runner._environ_args() == _docker_env_args(runner.environ)  # type: ignore
+    assert not list(tmp_path.glob("*.env"))
+
+
+@pytest.mark.parametrize("image_missing", [False, True])
+def test_run_api(tmp_path: pathlib.Path, image_missing: bool) -> None:
+    """The Engine API backend creates, attaches, starts, waits and removes."""
+    docker = pytest.importorskip("docker")
+    client = mock.MagicMock()
+    if image_missing:
+        client.containers.create.side_effect = [
+            docker.errors.ImageNotFound("missing"),
+            mock.DEFAULT,
+        ]
+    container = client.containers.create.return_value
+    container.wait.return_value = {"StatusCode": 0}
+    sock, peer = socket.socketpair()
+    peer.sendall(_frame(1, b"out\n") + _frame(2, b"err\n"))
+    peer.close()
+    client.api.attach_socket.return_value = sock
+
+    with mock.patch("docker.from_env", return_value=client):
+        runner = DockerRunner(
+            data_dir=tmp_path, use_docker_api=True, prefetch_images=False
+        )
+    execution = runner.start_execution(
+        Metadata(id="id", name="tool", package="pkg", container_image_tag="image")
+    )
+    stdout: list[str] = []
+    stderr: list[str] = []
+    execution.run(["my tool", "arg"], stdout.append, stderr.append)
+
+    assert client.containers.create.call_args.kwargs["entrypoint"] == ["my tool"]
+    assert client.containers.create.call_args.kwargs["command"] == ["arg"]
+    assert stdout == ["out"]
+    assert stderr == ["err"]
+    assert [
+        name
+        for name, _, _ in client.mock_calls
+        if name.startswith(("containers.create", "api.attach", "images.pull"))
+    ] == [
+        *(["containers.create", "images.pull"] if image_missing else []),
+        "containers.create",
+        "api.attach_socket",
+        "containers.create().start",
+        "containers.create().wait",
+        "containers.create().remove",
+    ]
+    assert sock.fileno() == -1
+
+
+def test_run_api_start_failure(tmp_path: pathlib.Path) -> None:
+    """Engine API start errors are StyxDockerErrors and clean up after themselves."""
+    docker = pytest.importorskip("docker")
+    client = mock.MagicMock()
+    container = client.containers.create.return_value
+    container.start.side_effect = docker.errors.APIError("executable not found")
+    sock, peer = socket.socketpair()
+    peer.close()
+    client.api.attach_socket.return_value = sock
+
+    with mock.patch("docker.from_env", return_value=client):
+        runner = DockerRunner(
+            data_dir=tmp_path, use_docker_api=True, prefetch_images=False
+        )
+    execution = runner.start_execution(
+        Metadata(id="id", name="tool", package="pkg", container_image_tag="image")
+    )
+    with pytest.raises(StyxDockerError) as error:
+        execution.run(["tool"])
+
+    assert error.value.command_args == ["tool"]
+    assert sock.fileno() == -1
+    container.remove.assert_called_once_with(force=True)
+
+
+def test_exec_api_failure(tmp_path: pathlib.Path) -> None:
+    """Engine API exec errors are StyxDockerErrors."""
+    docker = pytest.importorskip("docker")
+    client = mock.MagicMock()
+    client.api.exec_create.side_effect = docker.errors.APIError("no such container")
+
+    with mock.patch("docker.from_env", return_value=client):
+        runner = DockerRunner(
+            data_dir=tmp_path,
+            use_docker_api=True,
+            reuse_containers=True,
+            prefetch_images=False,
+        )
+    execution = runner.start_execution(
+        Metadata(id="id", name="tool", package="pkg", container_image_tag="image")
+    )
+    with pytest.raises(StyxDockerError) as error:
+        execution.run(["tool"])
+
+    assert error.value.command_args == ["tool"]
+
+
+@pytest.mark.parametrize("run_script", [False, True])
+def test_docker_command(tmp_path: pathlib.Path, run_script: bool) -> None:
+    """The command is the entrypoint, or run.sh is run through bash."""
+    runner = DockerRunner(
+        data_dir=tmp_path,
+        docker_user_id=1000,
+        run_script=run_script,
+        prefetch_images=False,
+    )
+    execution = runner.start_execution(
+        Metadata(id="id", name="tool", package="pkg", container_image_tag="x")
+    )
+    with mock.patch.object(_DockerExecution, "_run_cli", return_value=0) as run_cli:
+        execution.run(["/opt/my tool/run", "a b"])
+
+    output_dir = execution.output_dir
+    command = (
+        ["/bin/bash", "x", "./run.sh"]
+        if run_script
+        else ["/opt/my tool/run", "x", "a b"]
+    )
+    assert run_cli.call_args.args[0] == [
+        "docker",
+        "run",
+        "--rm",
+        "--name",
+        f"styx_{output_dir.name}",
+        "-u",
+        "1000",
+        "-w",
+        "/styx_output",
+        "--mount",
+        f"type=bind,source={output_dir.absolute().as_posix()},target=/styx_output",
+        "--entrypoint",
+        *command,
+    ]
+    assert (output_dir / "run.sh").exists() == run_script
+
+
+def test_run_without_command(tmp_path: pathlib.Path) -> None:
+    """Running an empty command is an error."""
+    runner = DockerRunner(data_dir=tmp_path, prefetch_images=False)
+    execution = runner.start_execution(
+        Metadata(id="id", name="tool", package="pkg", container_image_tag="x")
+    )
+    with pytest.raises(ValueError):
+        execution.run([])
+
+
+def test_batch(tmp_path: pathlib.Path) -> None:
+    """Batched executions share a container and failures name their command."""
+    runner = DockerRunner(
+        data_dir=tmp_path / "data", docker_user_id=1000, prefetch_images=False
+    )
+    (tmp_path / "in.txt").touch()
+    metadata = Metadata(id="id", name="tool", package="pkg", container_image_tag="x")
+    scripts: list[str] = []
+
+    def run_cli(
+        docker_command: list[str],
+        stdout_handler: typing.Callable[[str], None],
+        stderr_handler: typing.Callable[[str], None],
+    ) -> int:
+        name = docker_command[docker_command.index("--name") + 1]
+        scripts.append((tmp_path / "data" / f"{name}.sh").read_text())
+        for line in [f"{name}:0", "a", f"no-newline{name}:1", "b"]:
+            stdout_handler(line)
+        return 3
+
+    stdout: list[list[str]] = [[], []]
+    with mock.patch.object(_DockerExecution, "_run_cli", side_effect=run_cli) as cli:
+        with pytest.raises(StyxDockerError) as error:
+            with runner.batch():
+                first = runner.start_execution(metadata)
+                first.run(
+                    ["tool", first.input_file(tmp_path / "in.txt")], stdout[0].append
+                )
+                second = runner.start_execution(metadata)
+                second.run(["tool", "a b"], stdout[1].append)
+
+    assert stdout == [["a", "no-newline"], ["b"]]
+    assert error.value.return_code == 3
+    assert error.value.command_args == ["tool", "a b"]
+
+    name = f"styx_{runner.uid}_batch_0"
+    data_dir = (tmp_path / "data").absolute().as_posix()
+    first_dir = first.output_dir.name  # type: ignore
+    second_dir = second.output_dir.name  # type: ignore
+    assert cli.call_args.args[0] == [
+        "docker",
+        "run",
+        "--rm",
+        "--name",
+        name,
+        "-u",
+        "1000",
+        "-w",
+        "/",
+        "--mount",
+        f"type=bind,source={tmp_path.absolute().as_posix()}/in.txt,"
+        f"target=/styx_input/{first_dir}/0/in.txt,readonly",
+        "--mount",
+        f"type=bind,source={data_dir}/{first_dir},target=/styx_output/{first_dir}",
+        "--mount",
+        f"type=bind,source={data_dir}/{second_dir},target=/styx_output/{second_dir}",
+        "--mount",
+        f"type=bind,source={data_dir}/{name}.sh,target=/styx_data/{name}.sh,readonly",
+        "--entrypoint",
+        "/bin/bash",
+        "x",
+        f"/styx_data/{name}.sh",
+    ]
+    assert scripts == [
+        f"echo {name}:0; echo {name}:0 >&2\n"
+        f"cd /styx_output/{first_dir} && tool /styx_input/{first_dir}/0/in.txt"
+        " || exit $?\n"
+        f"echo {name}:1; echo {name}:1 >&2\n"
+        f"cd /styx_output/{second_dir} && tool 'a b' || exit $?\n"
+    ]
+    assert not (tmp_path / "data" / f"{name}.sh").exists()
+
+
+def test_batch_is_per_thread(tmp_path: pathlib.Path) -> None:
+    """Executions started by other threads during a batch are not deferred."""
+    runner = DockerRunner(data_dir=tmp_path, prefetch_images=False)
+    metadata = Metadata(id="id", name="tool", package="pkg", container_image_tag="x")
+    executions = []
+    with runner.batch():
+        executions.append(runner.start_execution(metadata))
+        thread = threading.Thread(
+            target=lambda: executions.append(runner.start_execution(metadata))
+        )
+        thread.start()
+        thread.join()
+
+    assert executions[0].batch is not None  # type: ignore
+    assert executions[1].batch is None  # type: ignore
+
+
+def test_batch_run_after_exit(tmp_path: pathlib.Path) -> None:
+    """Running an execution after its batch block exited is an error."""
+    runner = DockerRunner(data_dir=tmp_path, prefetch_images=False)
+    with runner.batch():
+        execution = runner.start_execution(
+            Metadata(id="id", name="tool", package="pkg", container_image_tag="x")
+        )
+    with pytest.raises(RuntimeError):
+        execution.run(["true"])
+
+
+# Emulates the Docker CLI on the host for long-lived containers: `run -d`
+# records the data directory mount, `exec` runs the command on the host with
+# /styx_data mapped to it and the variables of an `--env-file`. No images
+# exist locally and pulls hang. All invocations are logged to docker.log.
+_FAKE_DOCKER = """\
+import json, os, subprocess, sys, time
+
+args = sys.argv[1:]
+state = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(state, "docker.log"), "a") as log:
+    log.write(json.dumps(args) + "\\n")
+if args[0] == "image":
+    sys.exit(1)
+elif args[0] == "pull":
+    time.sleep(60)
+elif args[0] == "run" and "fail" in args:
+    print("failed to start", file=sys.stderr)
+    sys.exit(125)
+elif args[0] == "run":
+    mount = args[args.index("--mount") + 1]
+    source = dict(kv.split("=", 1) for kv in mount.split(","))["source"]
+    with open(os.path.join(state, "c0"), "w") as f:
+        f.write(source)
+    print("c0")
+elif args[0] == "exec":
+    env = dict(os.environ)
+    i = 1
+    while args[i].startswith("-"):
+        if args[i] == "--env-file":
+            with open(args[i + 1]) as f:
+                env.update(line.rstrip("\\n").split("=", 1) for line in f)
+        i += 2
+    with open(os.path.join(state, args[i])) as f:
+        source = f.read()
+    wd, *command = [
+        arg.replace("/styx_data", source, 1) if arg.startswith("/styx_data") else arg
+        for arg in [args[args.index("-w") + 1], *args[i + 1 :]]
+    ]
+    sys.exit(subprocess.call(command, cwd=wd, env=env))
+"""
+
+
+@pytest.fixture
+def fake_docker(tmp_path: pathlib.Path) -> pathlib.Path:
+    """Path of a fake `docker` executable, see `_FAKE_DOCKER`."""
+    if os.name != "posix":
+        pytest.skip("fake docker executable needs a shebang")
+    docker = tmp_path / "bin" / "docker"
+    docker.parent.mkdir()
+    docker.write_text(f"#!{sys.executable}\n{_FAKE_DOCKER}")
+    docker.chmod(0o755)
+    return docker
+
+
+def test_reuse_containers_stages_inputs(
+    tmp_path: pathlib.Path, fake_docker: pathlib.Path
+) -> None:
+    """Inputs are staged for docker exec and changes to mutable ones written back."""
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    (inputs / "ro.txt").write_text("ro")
+    (inputs / "mut.txt").write_text("mut")
+    for name in ["sub.a", "sub.b", "other"]:
+        (inputs / name).write_text(name)
+    tool = (
+        "import os, sys\n"
+        "ro, mut, prefix = sys.argv[1:]\n"
+        "open(ro, 'a').write(' changed')\n"
+        "open(mut, 'a').write(' changed')\n"
+        "print(*sorted(os.listdir(os.path.dirname(prefix))))\n"
+        "open(prefix + '.out', 'w').write('new')\n"
+    )
+
+    with DockerRunner(
+        docker_executable=str(fake_docker),
+        data_dir=tmp_path / "data",
+        reuse_containers=True,
+        prefetch_images=False,
+    ) as runner:
+        stdout: list[str] = []
+        for _ in range(2):
+            execution = runner.start_execution(
+                Metadata(id="id", name="tool", package="pkg", container_image_tag="x")
+            )
+            cargs = [
+                sys.executable,
+                "-c",
+                tool,
+                execution.input_file(inputs / "ro.txt"),
+                execution.input_file(inputs / "mut.txt", mutable=True),
+                execution.input_file(inputs / "sub", resolve_parent=True, mutable=True),
+            ]
+            execution.run(cargs, stdout.append)
+            assert not (execution.output_dir / ".styx_input").exists()
+
+    assert (inputs / "ro.txt").read_text() == "ro"
+    assert (inputs / "mut.txt").read_text() == "mut changed changed"
+    assert (inputs / "sub.out").read_text() == "new"
+    assert stdout == ["sub.a sub.b", "sub.a sub.b sub.out"]
+    log = [
+        json.loads(line)
+        for line in (fake_docker.parent / "docker.log").read_text().splitlines()
+    ]
+    assert [args[0] for args in log] == ["run", "exec", "exec", "rm"]
+    assert log[2] == [
+        "exec",
+        "-w",
+        f"/styx_data/{execution.output_dir.name}",
+        "c0",
+        *cargs,
+    ]
+    assert log[3] == ["rm", "-f", "c0"]
+
+
+def test_reuse_containers_environ(
+    tmp_path: pathlib.Path, fake_docker: pathlib.Path
+) -> None:
+    """Executions in a long-lived container see the current environment."""
+    stdout: list[str] = []
+    with DockerRunner(
+        docker_executable=str(fake_docker),
+        data_dir=tmp_path / "data",
+        environ={"A": "1"},
+        reuse_containers=True,
+        prefetch_images=False,
+    ) as runner:
+        for value in ["1", "2"]:
+            runner.environ["A"] = value
+            execution = runner.start_execution(
+                Metadata(id="id", name="tool", package="pkg", container_image_tag="x")
+            )
+            execution.run(
+                [sys.executable, "-c", "import os; print(os.environ['A'])"],
+                stdout.append,
+            )
+    assert stdout == ["1", "2"]
+
+
+def test_reusable_container_threads(
+    tmp_path: pathlib.Path, fake_docker: pathlib.Path
+) -> None:
+    """Threads sharing a runner share one long-lived container per image."""
+    with DockerRunner(
+        docker_executable=str(fake_docker),
+        data_dir=tmp_path / "data",
+        reuse_containers=True,
+        prefetch_images=False,
+    ) as runner:
+        container_ids: list[str] = []
+        threads = [
+            threading.Thread(
+                target=lambda: container_ids.append(
+                    runner._reusable_container("x")  # type: ignore
+                )
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert container_ids == ["c0"] * 8
+    log = [
+        json.loads(line)[0]
+        for line in (fake_docker.parent / "docker.log").read_text().splitlines()
+    ]
+    assert log == ["run", "rm"]
+
+
+def test_reusable_container_start_failure(
+    tmp_path: pathlib.Path,
+    fake_docker: pathlib.Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Docker's error message is logged when a container can't be started."""
+    runner = DockerRunner(
+        docker_executable=str(fake_docker),
+        data_dir=tmp_path / "data",
+        reuse_containers=True,
+        prefetch_images=False,
+    )
+    with pytest.raises(StyxDockerError) as error:
+        runner._reusable_container("fail")  # type: ignore
+    assert error.value.return_code == 125
+    assert "Failed to start container: failed to start" in caplog.messages
+
+
+def test_close_twice(tmp_path: pathlib.Path, fake_docker: pathlib.Path) -> None:
+    """A runner can be closed, used again and closed again."""
+    runner = DockerRunner(
+        docker_executable=str(fake_docker),
+        data_dir=tmp_path / "data",
+        environ={"A": "1"},
+        reuse_containers=True,
+        prefetch_images=False,
+    )
+    for _ in range(2):
+        with runner:
+            execution = runner.start_execution(
+                Metadata(id="id", name="tool", package="pkg", container_image_tag="x")
+            )
+            execution.run(["true"])
+        assert not list((tmp_path / "data").glob("*.env"))
+
+    log = [
+        json.loads(line)[0]
+        for line in (fake_docker.parent / "docker.log").read_text().splitlines()
+    ]
+    assert log == ["run", "exec", "rm", "run", "exec", "rm"]
+
+
+def test_reuse_containers_rejects_directories(tmp_path: pathlib.Path) -> None:
+    """Directory inputs would be copied whole, so they are rejected."""
+    runner = DockerRunner(
+        data_dir=tmp_path / "data", reuse_containers=True, prefetch_images=False
+    )
+    execution = runner.start_execution(
+        Metadata(id="id", name="tool", package="pkg", container_image_tag="x")
+    )
+    with pytest.raises(ValueError):
+        execution.input_file(tmp_path)
+
+
+def _wait_for_pull(fake_docker: pathlib.Path) -> None:
+    """Wait until the fake docker executable was asked to pull an image."""
+    log = fake_docker.parent / "docker.log"
+    for _ in range(500):
+        if log.exists() and '"pull"' in log.read_text():
+            return
+        time.sleep(0.01)
+    raise TimeoutError("no pull started")
+
+
+def test_close_stops_pulls(tmp_path: pathlib.Path, fake_docker: pathlib.Path) -> None:
+    """Closing the runner kills running image pulls."""
+    runner = DockerRunner(docker_executable=str(fake_docker), data_dir=tmp_path)
+    future = runner.prefetch("x")
+    _wait_for_pull(fake_docker)
+    runner.close()
+    future.result(timeout=10)
+
+
+def test_pulls_dont_block_exit(
+    tmp_path: pathlib.Path, fake_docker: pathlib.Path
+) -> None:
+    """The interpreter exits without waiting for image pulls."""
+    script = (
+        "import sys\n"
+        "from styxdefs import Metadata\n"
+        "from styxdocker import DockerRunner\n"
+        "runner = DockerRunner(docker_executable=sys.argv[1], data_dir=sys.argv[2])\n"
+        "runner.start_execution(\n"
+        "    Metadata(id='id', name='tool', package='pkg', container_image_tag='x')\n"
+        ")\n"
+        "import os, time\n"
+        "log = sys.argv[3]\n"
+        "while not os.path.exists(log) or 'pull' not in open(log).read():\n"
+        "    time.sleep(0.01)\n"
+    )
+    time_start = time.monotonic()
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            script,
+            str(fake_docker),
+            str(tmp_path),
+            str(fake_docker.parent / "docker.log"),
+        ],
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        timeout=30,
+    )
+    assert time.monotonic() - time_start < 10